@@ -17,7 +17,7 @@ def debug_scraping():
         r.raise_for_status()
         print(f"✅ Successfully fetched hub page (status: {r.status_code})")
         
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = BeautifulSoup(r.text, "lxml")
         
         # Debug: Check if the selector is finding anything
         print("\n🔍 Looking for links with selector: '#hub‑index a[href*='hypertrophy']'")
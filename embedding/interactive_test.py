@@ -6,6 +6,7 @@ Run with: uv run interactive_test.py
 
 import requests
 from qdrant_client import QdrantClient
+from functools import lru_cache
 import os
 
 # Configuration
@@ -33,26 +34,32 @@ class LMStudioEmbedding:
         embeddings = [item["embedding"] for item in data["data"]]
         return embeddings[0] if isinstance(text, str) else embeddings
 
+embedding_model = LMStudioEmbedding()
+client = QdrantClient(url="http://localhost:6333")
+
+@lru_cache(maxsize=256)
+def _cached_search(query_norm, top_k):
+    """Embed and search once per normalized query; repeats in a session are served from memory"""
+    # Generate embedding
+    query_vector = embedding_model.encode(query_norm)
+    
+    # Search
+    search_response = client.query_points(
+        collection_name=COLLECTION_NAME,
+        query=query_vector,
+        limit=top_k,
+        with_payload=True
+    )
+    return tuple(search_response.points)
+
 def search_knowledge_base(query, top_k=5):
     """Search the hypertrophy knowledge base"""
     try:
-        embedding_model = LMStudioEmbedding()
-        client = QdrantClient(url="http://localhost:6333")
-        
         print(f"🔍 Searching for: '{query}'")
         
-        # Generate embedding
-        query_vector = embedding_model.encode(query)
-        
-        # Search
-        search_response = client.query_points(
-            collection_name=COLLECTION_NAME,
-            query=query_vector,
-            limit=top_k,
-            with_payload=True
-        )
-        
-        results = search_response.points
+        # Case and spacing differences shouldn't miss the cache
+        query_norm = " ".join(query.split()).lower()
+        results = _cached_search(query_norm, top_k)
         
         if not results:
             print("❌ No results found.")
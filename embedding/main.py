@@ -1,23 +1,105 @@
 #!/usr/bin/env python3
-# pip install requests beautifulsoup4 qdrant-client
+# pip install requests beautifulsoup4 lxml qdrant-client (optional: orjson)
 
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+import soupsieve as sv
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, PointStruct
+from qdrant_client.models import (
+    VectorParams, PointStruct, HnswConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType
+)
 import textwrap
 import os
 import json
+import time
+import hashlib
+import sqlite3
+import uuid
+import numpy as np
+try:
+    import orjson  # optional: much faster (de)serialization of embedding payloads
+except ImportError:
+    orjson = None
 
 # 1. LM Studio configuration
 LM_STUDIO_BASE_URL = os.getenv("LM_STUDIO_URL", "http://172.21.96.1:1234")  # Default LM Studio port
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-nomic-embed-text-v1.5")  # Use the model name as it appears in LM Studio
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".embed_cache.sqlite")
+DIM_CACHE_PATH = os.path.expanduser("~/.cache/befit/embed_dim.json")
+
+class EmbeddingCache:
+    """Persistent on-disk cache of embeddings keyed by sha256(model + text)"""
+    def __init__(self, path=EMBED_CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+    
+    def get_many(self, keys):
+        """Return {key: vector} for every key present in the cache"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def put_many(self, items):
+        """Store (key, vector) pairs as raw float32 bytes"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vec.tobytes()) for key, vec in items]
+            )
+
+def json_dumps(obj):
+    """Serialize a request body to bytes, via orjson when available"""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+def json_loads(data):
+    """Parse a response body, via orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def load_cached_dimension(model):
+    """Return the embedding dimension recorded for model, if any"""
+    try:
+        with open(DIM_CACHE_PATH) as f:
+            return json.load(f).get(model)
+    except (OSError, ValueError):
+        return None
+
+def save_cached_dimension(model, dim):
+    """Record the embedding dimension for model so later runs can skip the probe request"""
+    try:
+        with open(DIM_CACHE_PATH) as f:
+            dims = json.load(f)
+    except (OSError, ValueError):
+        dims = {}
+    dims[model] = dim
+    try:
+        os.makedirs(os.path.dirname(DIM_CACHE_PATH), exist_ok=True)
+        with open(DIM_CACHE_PATH, "w") as f:
+            json.dump(dims, f)
+    except OSError as e:
+        print(f"⚠️  Could not write embedding dimension cache: {e}")
 
 class LMStudioEmbedding:
     def __init__(self, base_url=LM_STUDIO_BASE_URL, model=EMBEDDING_MODEL):
         self.base_url = base_url
         self.model = model
         self.embedding_dimension = None
+        self.cache = EmbeddingCache()
         
     def check_server_status(self):
         """Check if LM Studio server is running and what models are available"""
@@ -46,21 +128,44 @@ class LMStudioEmbedding:
             return []
     
     def encode(self, text):
-        """Generate embeddings using LM Studio's API"""
+        """Generate embeddings, only calling LM Studio for texts missing from the cache"""
+        texts = text if isinstance(text, list) else [text]
+        keys = [EmbeddingCache.key(self.model, t) for t in texts]
+        cached = self.cache.get_many(keys)
+        
+        missing = {key: t for t, key in zip(texts, keys) if key not in cached}
+        if missing:
+            vectors = self._request_embeddings(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        
+        embeddings = [cached[key] for key in keys]
+        
+        # Set dimension if not already set
+        if self.embedding_dimension is None:
+            self.embedding_dimension = len(embeddings[0])
+            save_cached_dimension(self.model, self.embedding_dimension)
+        
+        # Return single embedding if single text was passed
+        return embeddings[0] if isinstance(text, str) else embeddings
+    
+    def _request_embeddings(self, texts):
+        """Call LM Studio's embeddings API for a list of texts"""
         url = f"{self.base_url}/v1/embeddings"
         headers = {
             "Content-Type": "application/json"
         }
         payload = {
             "model": self.model,
-            "input": text if isinstance(text, list) else [text],
+            "input": texts,
             "encoding_format": "float"
         }
         
         try:
             print(f"Sending request to: {url}")
             print(f"Model: {self.model}")
-            response = requests.post(url, headers=headers, json=payload)
+            response = SESSION.post(url, headers=headers, data=json_dumps(payload))
             
             if response.status_code == 404:
                 print("❌ 404 Error: The embeddings endpoint was not found")
@@ -74,17 +179,10 @@ class LMStudioEmbedding:
                 raise requests.exceptions.HTTPError(f"404 Client Error: Embeddings endpoint not found")
             
             response.raise_for_status()
-            data = response.json()
+            data = json_loads(response.content)
             
-            # Extract embeddings from response
-            embeddings = [item["embedding"] for item in data["data"]]
-            
-            # Set dimension if not already set
-            if self.embedding_dimension is None:
-                self.embedding_dimension = len(embeddings[0])
-            
-            # Return single embedding if single text was passed
-            return embeddings[0] if isinstance(text, str) else embeddings
+            # Extract embeddings from response as contiguous float32 arrays
+            return [np.asarray(item["embedding"], dtype=np.float32) for item in data["data"]]
             
         except requests.exceptions.RequestException as e:
             print(f"Error calling LM Studio API: {e}")
@@ -96,6 +194,8 @@ class LMStudioEmbedding:
     
     def get_sentence_embedding_dimension(self):
         """Get the embedding dimension"""
+        if self.embedding_dimension is None:
+            self.embedding_dimension = load_cached_dimension(self.model)
         if self.embedding_dimension is None:
             # Test with a small text to determine dimension
             test_embedding = self.encode("test")
@@ -105,46 +205,186 @@ class LMStudioEmbedding:
 # Initialize the embedding model
 model = LMStudioEmbedding()
 
-# 2. Initialize Qdrant client (local on port 6333)
-qdr = QdrantClient(url="http://localhost:6333")
+# 2. Initialize Qdrant client, shared by the whole run (local; REST on 6333, traffic goes over gRPC on 6334)
+QDRANT_URL = "http://localhost:6333"
+qdr = QdrantClient(
+    url=QDRANT_URL,
+    prefer_grpc=True,
+    timeout=30,
+    grpc_options={
+        # Room for large upsert batches of high-dimensional vectors
+        "grpc.max_send_message_length": 64 * 1024 * 1024,
+        "grpc.max_receive_message_length": 64 * 1024 * 1024,
+    },
+)
 COLL = "rp_exercises"
+# Digests of indexed chunks, kept per Qdrant server + collection so it doesn't depend on the working directory
+SEEN_CHUNKS_PATH = os.path.join(
+    os.path.expanduser("~/.cache/befit/indexed_chunks"),
+    "".join(c if c.isalnum() else "_" for c in f"{QDRANT_URL}_{COLL}") + ".bin"
+)
+
+# 3. Shared HTTP session for scraping (keep-alive + connection pooling)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+# requests decompresses these transparently ("br" would need the optional brotli package)
+SESSION.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "befit-scraper/1.0"})
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Raw pages are cached on disk so reruns don't re-download unchanged articles
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_TTL = 24 * 60 * 60  # seconds
+FETCH_WORKERS = 8
+UPSERT_BATCH_SIZE = 128
+MIN_CHUNK_CHARS = 400
+
+# CSS selectors compiled once and reused for every page
+HYPERTROPHY_LINK_SELECTOR = sv.compile("a[href*='hypertrophy']")
+
+# fetch_page queries lxml directly; XPath is compiled once and evaluated in C
+TITLE_XPATH = etree.XPath("//h1[1]")
+# One walk finds every candidate body container, returned in document order
+BODY_XPATH = etree.XPath("//*[contains(concat(' ', normalize-space(@class), ' '), ' blog-body ')] | //article")
+TEXT_XPATH = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]")
 
 # 4. Scraping logic
+def normalize_url(url):
+    """Drop query strings, fragments and trailing slashes so variants of one article dedupe"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/"), "", ""))
+
+def fetch_html(url):
+    """GET url and return its HTML bytes (None for non-HTML), served from the on-disk cache when fresh.
+    
+    Stale cache entries are revalidated with ETag / Last-Modified, so unchanged pages come back as a 304.
+    """
+    key = hashlib.sha256(url.encode()).hexdigest()
+    path = os.path.join(HTTP_CACHE_DIR, key + ".html")
+    meta_path = os.path.join(HTTP_CACHE_DIR, key + ".json")
+    headers = {}
+    try:
+        if time.time() - os.path.getmtime(path) < HTTP_CACHE_TTL:
+            with open(path, "rb") as f:
+                return f.read()
+        with open(meta_path) as f:
+            validators = json.load(f)
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    except (OSError, ValueError):
+        pass
+    
+    r = SESSION.get(url, headers=headers, timeout=10)
+    if r.status_code == 304:
+        # Unchanged since we cached it; mark the cached copy fresh again
+        os.utime(path)
+        with open(path, "rb") as f:
+            return f.read()
+    r.raise_for_status()
+    # Skip PDFs, images and other non-HTML links without parsing them
+    if r.headers.get("content-type", "").split(";")[0].strip() not in HTML_CONTENT_TYPES:
+        return None
+    
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(r.content)
+    os.replace(path + ".tmp", path)
+    with open(meta_path, "w") as f:
+        json.dump({"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}, f)
+    return r.content
+
 def get_section_links():
     hub = "https://rpstrength.com/blogs/articles/complete-hypertrophy-training-guide"
-    r = requests.get(hub); r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(fetch_html(hub), "lxml")
     
     # Find all hypertrophy-related links
     links = []
-    for link in soup.select("a[href*='hypertrophy']"):
+    for link in HYPERTROPHY_LINK_SELECTOR.select(soup):
         href = link.get("href", "")
         # Skip app links and focus on article links
         if href and "blogs/articles" in href and href not in ["/pages/hypertrophy-app"]:
             full_url = href if href.startswith("http") else "https://rpstrength.com" + href
-            links.append(full_url)
+            links.append(normalize_url(full_url))
     
-    # Remove duplicates and return
+    # Remove duplicates (after normalization, so ?utm_* and #anchor variants collapse) and return
     return list(set(links))
 
+def node_text(node, separator):
+    """Equivalent of BeautifulSoup's get_text(separator, strip=True)"""
+    return separator.join(t for t in (s.strip() for s in TEXT_XPATH(node)) if t)
+
+def pick_body(candidates):
+    """Prefer .blog-body, then <article> among the BODY_XPATH matches"""
+    for node in candidates:
+        if "blog-body" in node.get("class", "").split():
+            return node
+    for node in candidates:
+        if node.tag == "article":
+            return node
+    return None
+
 def fetch_page(url):
-    r = requests.get(url); r.raise_for_status()
-    s = BeautifulSoup(r.text, "html.parser")
-    title = s.find("h1").get_text(strip=True)
-    body = (s.select_one(".blog-body") or s.select_one("article")).get_text("\n", strip=True)
+    html = fetch_html(url)
+    if html is None:
+        raise ValueError("Not an HTML page")
+    tree = lxml_html.fromstring(html)
+    titles = TITLE_XPATH(tree)
+    body_elem = pick_body(BODY_XPATH(tree))
+    if not titles or body_elem is None:
+        raise ValueError("Page has no <h1> title or article body")
+    title = node_text(titles[0], "")
+    body = node_text(body_elem, "\n")
     return title, body
 
+def create_collection(dim):
+    """(Re)create the collection, dropping any existing points"""
+    qdr.recreate_collection(
+        collection_name=COLL,
+        vectors_config=VectorParams(size=dim, distance="Cosine"),
+        hnsw_config=HnswConfigDiff(m=16, ef_construct=128),
+        # int8 scalar quantization keeps ~4x less vector data in RAM
+        quantization_config=ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+        )
+    )
+
+def chunk_digest(chunk):
+    """16-byte content hash used to skip duplicate chunks and as the Qdrant point ID"""
+    return hashlib.blake2b(chunk.encode(), digest_size=16).digest()
+
+def load_seen_chunks():
+    """Digests of chunks indexed by previous runs"""
+    try:
+        with open(SEEN_CHUNKS_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        return set()
+    return {data[i:i + 16] for i in range(0, len(data) - len(data) % 16, 16)}
+
+def save_seen_chunks(seen):
+    os.makedirs(os.path.dirname(SEEN_CHUNKS_PATH), exist_ok=True)
+    with open(SEEN_CHUNKS_PATH, "wb") as f:
+        f.write(b"".join(seen))
+
 # 5. Chunking helper
 def chunk_text(text, max_chars=2000):
-    paragraphs = [p.strip() for p in text.split("\n\n") if len(p.strip()) > 200]
-    current, chunks = [], []
+    # Strip each paragraph once (str.strip runs in C via map) instead of twice per paragraph
+    paragraphs = [p for p in map(str.strip, text.split("\n\n")) if len(p) > 200]
+    current, current_len, chunks = [], 0, []
     for p in paragraphs:
-        if sum(len(x) for x in current) + len(p) > max_chars:
+        # +2 accounts for the "\n\n" separator added when joining
+        if current and current_len + len(p) + 2 > max_chars:
             chunks.append("\n\n".join(current))
-            current = []
+            current, current_len = [], 0
         current.append(p)
+        current_len += len(p) + 2
     if current:
         chunks.append("\n\n".join(current))
+    
+    # Fold a short trailing fragment into the previous chunk rather than embedding it alone
+    if len(chunks) > 1 and len(chunks[-1]) < 500:
+        tail = chunks.pop()
+        chunks[-1] += "\n\n" + tail
     return chunks
 
 # 6. Main ingestion
@@ -157,11 +397,11 @@ def main():
         print("❌ Cannot proceed without a working LM Studio connection")
         return
     
-    # Test embedding generation
+    # Resolve the embedding dimension (cached per model, otherwise probes LM Studio)
     try:
-        print("Testing embedding generation...")
-        test_embedding = model.encode("test connection")
-        print(f"✅ LM Studio connected successfully. Embedding dimension: {len(test_embedding)}")
+        print("Resolving embedding dimension...")
+        embedding_dim = model.get_sentence_embedding_dimension()
+        print(f"✅ LM Studio connected successfully. Embedding dimension: {embedding_dim}")
     except Exception as e:
         print(f"❌ Failed to generate embeddings: {e}")
         print("Make sure an embedding model is loaded in LM Studio and the server is started")
@@ -174,13 +414,25 @@ def main():
         
         if COLL not in collection_names:
             print(f"Creating Qdrant collection '{COLL}'...")
-            qdr.recreate_collection(
-                collection_name=COLL,
-                vectors_config=VectorParams(size=len(test_embedding), distance="Cosine")
-            )
+            create_collection(embedding_dim)
             print(f"✅ Collection '{COLL}' created")
+            # Fresh collection: nothing from earlier runs is indexed any more
+            seen_chunks = set()
         else:
             print(f"✅ Collection '{COLL}' already exists")
+            points_count = qdr.get_collection(COLL).points_count
+            # A leftover hash file is stale once the collection has been emptied
+            seen_chunks = load_seen_chunks() if points_count else set()
+            if points_count and not os.path.exists(SEEN_CHUNKS_PATH):
+                # e.g. points indexed with the old integer IDs, or by a run on another machine
+                print(f"⚠️  Collection has {points_count} points but no record of their chunks ({SEEN_CHUNKS_PATH})")
+                print("   Indexing into it again would store every chunk a second time")
+                response = input("  Do you want to clear existing data and re-index? (y/N): ").strip().lower()
+                if response != 'y':
+                    print("❌ Leaving the existing collection untouched")
+                    return
+                create_collection(embedding_dim)
+                print(f"✅ Collection '{COLL}' recreated")
     except Exception as e:
         print(f"❌ Error with Qdrant: {e}")
         return
@@ -194,25 +446,55 @@ def main():
         print("❌ No links found to process. Check the scraping logic.")
         return
     
-    idx = 1
-    for url in links:
-        try:
-            print(f"Processing {url}...")
-            title, body = fetch_page(url)
-            chunks = chunk_text(body)
-            print(f"  Created {len(chunks)} chunks for: {title[:50]}...")
+    pending = []
+    last_batch = []
+    # Fetch pages concurrently; embedding and upserts stay on the main thread
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = [executor.submit(fetch_page, url) for url in links]
+        for url, future in zip(links, futures):
+            try:
+                print(f"Processing {url}...")
+                title, body = future.result()
+                # Very short chunks embed poorly and still cost an API call
+                chunks = [c for c in chunk_text(body) if len(c) >= MIN_CHUNK_CHARS]
+                print(f"  Created {len(chunks)} chunks for: {title[:50]}...")
+            
+                # Skip chunks that are already indexed (boilerplate shared across articles, earlier runs)
+                new_chunks = {}
+                for chunk in chunks:
+                    digest = chunk_digest(chunk)
+                    if digest not in seen_chunks:
+                        new_chunks.setdefault(digest, chunk)
+                if not new_chunks:
+                    print("  No new chunks to index")
+                    continue
             
-            for chunk in chunks:
-                vec = model.encode(chunk)
-                qdr.upsert(
-                    collection_name=COLL,
-                    points=[PointStruct(id=idx, vector=vec, payload={"title": title, "url": url, "content": chunk[:200] + "..."})]
+                # One embeddings request per article; upserts are batched across articles
+                vectors = model.encode(list(new_chunks.values()))
+                pending.extend(
+                    PointStruct(id=str(uuid.UUID(bytes=digest)), vector=vec.tolist(), payload={"title": title, "url": url, "content": chunk[:200] + "..."})
+                    for (digest, chunk), vec in zip(new_chunks.items(), vectors)
                 )
-                print(f"  Indexed chunk {idx}")
-                idx += 1
-        except Exception as e:
-            print(f"❌ Error processing {url}: {e}")
-            continue
+                seen_chunks.update(new_chunks)
+                if len(pending) >= UPSERT_BATCH_SIZE:
+                    # Don't block on the server applying the batch while we keep scraping
+                    qdr.upsert(collection_name=COLL, points=pending, wait=False)
+                    last_batch, pending = pending, []
+                print(f"  Indexed {len(new_chunks)} new chunks")
+            except Exception as e:
+                print(f"❌ Error processing {url}: {e}")
+                continue
+    
+    # Final upsert waits so every earlier batch is applied before we report success. If the
+    # last flush emptied the queue, resend that batch instead (same IDs, so it's idempotent)
+    try:
+        final_batch = pending or last_batch
+        if final_batch:
+            qdr.upsert(collection_name=COLL, points=final_batch, wait=True)
+    except Exception as e:
+        print(f"❌ Error upserting final batch: {e}")
+        return
+    save_seen_chunks(seen_chunks)
     print("✅ Done indexing into Qdrant")
 
 if __name__ == "__main__":
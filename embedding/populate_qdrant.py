@@ -4,24 +4,44 @@ Populate Qdrant with exercise science articles using OpenRouter embeddings.
 This script scrapes RPStrength articles and stores them in Qdrant for RAG retrieval.
 
 Requirements:
-    pip install requests beautifulsoup4 qdrant-client python-dotenv
+    pip install requests beautifulsoup4 lxml qdrant-client python-dotenv
+    pip install orjson  # optional, faster JSON for embedding requests
 
 Usage:
     # Set your OpenRouter API key in .env file or export it:
     export OPENROUTER_API_KEY="sk-or-v1-your-key-here"
     
     # Make sure Qdrant is running:
-    docker run -p 6333:6333 -v $(pwd)/qdrant_storage:/qdrant/storage qdrant/qdrant
+    docker run -p 6333:6333 -p 6334:6334 -v $(pwd)/qdrant_storage:/qdrant/storage qdrant/qdrant
     
     # Run the script:
     python populate_qdrant.py
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+import soupsieve as sv
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, PointStruct
+from qdrant_client.models import (
+    VectorParams, PointStruct, HnswConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType
+)
 import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import uuid
+import numpy as np
+try:
+    import orjson  # optional: much faster (de)serialization of embedding payloads
+except ImportError:
+    orjson = None
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -33,6 +53,13 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "openai/text-embedding-ada-002")
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 COLLECTION_NAME = "rp_exercises"
+# Digests of indexed chunks, kept per Qdrant server + collection so it doesn't depend on the working directory
+SEEN_CHUNKS_PATH = os.path.join(
+    os.path.expanduser("~/.cache/befit/indexed_chunks"),
+    "".join(c if c.isalnum() else "_" for c in f"{QDRANT_URL}_{COLLECTION_NAME}") + ".bin"
+)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".embed_cache.sqlite")
+DIM_CACHE_PATH = os.path.expanduser("~/.cache/befit/embed_dim.json")
 
 if not OPENROUTER_API_KEY:
     print("❌ ERROR: OPENROUTER_API_KEY not found!")
@@ -46,6 +73,77 @@ print(f"✅ Qdrant URL: {QDRANT_URL}")
 print()
 
 
+def json_dumps(obj):
+    """Serialize a request body to bytes, via orjson when available"""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+
+def json_loads(data):
+    """Parse a response body, via orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def load_cached_dimension(model):
+    """Return the embedding dimension recorded for model, if any"""
+    try:
+        with open(DIM_CACHE_PATH) as f:
+            return json.load(f).get(model)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_dimension(model, dim):
+    """Record the embedding dimension for model so later runs can skip the probe request"""
+    try:
+        with open(DIM_CACHE_PATH) as f:
+            dims = json.load(f)
+    except (OSError, ValueError):
+        dims = {}
+    dims[model] = dim
+    try:
+        os.makedirs(os.path.dirname(DIM_CACHE_PATH), exist_ok=True)
+        with open(DIM_CACHE_PATH, "w") as f:
+            json.dump(dims, f)
+    except OSError as e:
+        print(f"⚠️  Could not write embedding dimension cache: {e}")
+
+
+class EmbeddingCache:
+    """Persistent on-disk cache of embeddings keyed by sha256(model + text)"""
+    
+    def __init__(self, path=EMBED_CACHE_PATH):
+        # Shared by the article worker threads, so serialize access ourselves
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+    
+    def get_many(self, keys):
+        """Return {key: vector} for every key present in the cache"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self.lock:
+                rows = self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def put_many(self, items):
+        """Store (key, vector) pairs as raw float32 bytes"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vec.tobytes()) for key, vec in items]
+            )
+
+
 class OpenRouterEmbedding:
     """Generate embeddings using OpenRouter API (same as your app)"""
     
@@ -54,9 +152,41 @@ class OpenRouterEmbedding:
         self.base_url = base_url
         self.model = model
         self.embedding_dimension = None
+        self.cache = EmbeddingCache()
     
     def encode(self, text):
-        """Generate embeddings using OpenRouter API"""
+        """Generate embeddings, only calling OpenRouter for texts missing from the cache"""
+        texts = text if isinstance(text, list) else [text]
+        keys = [EmbeddingCache.key(self.model, t) for t in texts]
+        cached = self.cache.get_many(keys)
+        
+        missing = {key: t for t, key in zip(texts, keys) if key not in cached}
+        if missing:
+            vectors = self._request_embeddings(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        
+        embeddings = [cached[key] for key in keys]
+        
+        # Set dimension if not already set
+        if self.embedding_dimension is None:
+            self.embedding_dimension = len(embeddings[0])
+            save_cached_dimension(self.model, self.embedding_dimension)
+        
+        # Return single embedding if single text was passed
+        return embeddings[0] if isinstance(text, str) else embeddings
+    
+    def get_sentence_embedding_dimension(self):
+        """Get the embedding dimension, probing the API only if it isn't cached"""
+        if self.embedding_dimension is None:
+            self.embedding_dimension = load_cached_dimension(self.model)
+        if self.embedding_dimension is None:
+            self.encode("test connection")
+        return self.embedding_dimension
+    
+    def _request_embeddings(self, texts):
+        """Call the OpenRouter embeddings API for a list of texts"""
         url = f"{self.base_url}/embeddings"
         headers = {
             "Content-Type": "application/json",
@@ -66,23 +196,16 @@ class OpenRouterEmbedding:
         }
         payload = {
             "model": self.model,
-            "input": text if isinstance(text, list) else [text]
+            "input": texts
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = SESSION.post(url, headers=headers, data=json_dumps(payload))
             response.raise_for_status()
-            data = response.json()
-            
-            # Extract embeddings from response
-            embeddings = [item["embedding"] for item in data["data"]]
+            data = json_loads(response.content)
             
-            # Set dimension if not already set
-            if self.embedding_dimension is None:
-                self.embedding_dimension = len(embeddings[0])
-            
-            # Return single embedding if single text was passed
-            return embeddings[0] if isinstance(text, str) else embeddings
+            # Extract embeddings from response as contiguous float32 arrays
+            return [np.asarray(item["embedding"], dtype=np.float32) for item in data["data"]]
             
         except requests.exceptions.RequestException as e:
             print(f"❌ Error calling OpenRouter API: {e}")
@@ -94,8 +217,88 @@ class OpenRouterEmbedding:
 # Initialize embedding model
 embedding_model = OpenRouterEmbedding(OPENROUTER_API_KEY)
 
-# Initialize Qdrant client
-qdrant_client = QdrantClient(url=QDRANT_URL)
+# Initialize Qdrant client (gRPC on port 6334 for faster bulk upserts), shared by the whole run
+qdrant_client = QdrantClient(
+    url=QDRANT_URL,
+    prefer_grpc=True,
+    timeout=30,
+    grpc_options={
+        # Room for large upsert batches of high-dimensional vectors
+        "grpc.max_send_message_length": 64 * 1024 * 1024,
+        "grpc.max_receive_message_length": 64 * 1024 * 1024,
+    },
+)
+
+# Shared HTTP session for scraping (keep-alive + connection pooling)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+# requests decompresses these transparently ("br" would need the optional brotli package)
+SESSION.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "befit-scraper/1.0"})
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Raw pages are cached on disk so reruns don't re-download unchanged articles
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_TTL = 24 * 60 * 60  # seconds
+FETCH_WORKERS = 8
+UPSERT_BATCH_SIZE = 128
+MIN_CHUNK_CHARS = 400
+
+# CSS selectors compiled once and reused for every page
+HYPERTROPHY_LINK_SELECTOR = sv.compile("a[href*='hypertrophy']")
+
+# fetch_page queries lxml directly; XPath is compiled once and evaluated in C
+TITLE_XPATH = etree.XPath("//h1[1]")
+# One walk finds every candidate body container, returned in document order
+BODY_XPATH = etree.XPath("//*[contains(concat(' ', normalize-space(@class), ' '), ' blog-body ')] | //article | //main")
+PARAGRAPH_XPATH = etree.XPath("//p")
+TEXT_XPATH = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]")
+
+
+def normalize_url(url):
+    """Drop query strings, fragments and trailing slashes so variants of one article dedupe"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/"), "", ""))
+
+
+def fetch_html(url):
+    """GET url and return its HTML bytes (None for non-HTML), served from the on-disk cache when fresh.
+    
+    Stale cache entries are revalidated with ETag / Last-Modified, so unchanged pages come back as a 304.
+    """
+    key = hashlib.sha256(url.encode()).hexdigest()
+    path = os.path.join(HTTP_CACHE_DIR, key + ".html")
+    meta_path = os.path.join(HTTP_CACHE_DIR, key + ".json")
+    headers = {}
+    try:
+        if time.time() - os.path.getmtime(path) < HTTP_CACHE_TTL:
+            with open(path, "rb") as f:
+                return f.read()
+        with open(meta_path) as f:
+            validators = json.load(f)
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    except (OSError, ValueError):
+        pass
+    
+    r = SESSION.get(url, headers=headers, timeout=10)
+    if r.status_code == 304:
+        # Unchanged since we cached it; mark the cached copy fresh again
+        os.utime(path)
+        with open(path, "rb") as f:
+            return f.read()
+    r.raise_for_status()
+    # Skip PDFs, images and other non-HTML links without parsing them
+    if r.headers.get("content-type", "").split(";")[0].strip() not in HTML_CONTENT_TYPES:
+        return None
+    
+    os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(r.content)
+    os.replace(path + ".tmp", path)
+    with open(meta_path, "w") as f:
+        json.dump({"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}, f)
+    return r.content
 
 
 def get_section_links():
@@ -104,20 +307,18 @@ def get_section_links():
     print(f"📡 Scraping articles from: {hub}")
     
     try:
-        r = requests.get(hub, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = BeautifulSoup(fetch_html(hub), "lxml")
         
         # Find all hypertrophy-related links
         links = []
-        for link in soup.select("a[href*='hypertrophy']"):
+        for link in HYPERTROPHY_LINK_SELECTOR.select(soup):
             href = link.get("href", "")
             # Skip app links and focus on article links
             if href and "blogs/articles" in href and href not in ["/pages/hypertrophy-app"]:
                 full_url = href if href.startswith("http") else "https://rpstrength.com" + href
-                links.append(full_url)
+                links.append(normalize_url(full_url))
         
-        # Remove duplicates
+        # Remove duplicates (after normalization, so ?utm_* and #anchor variants collapse)
         unique_links = list(set(links))
         print(f"✅ Found {len(unique_links)} unique article links")
         return unique_links
@@ -127,25 +328,44 @@ def get_section_links():
         return []
 
 
+def node_text(node, separator):
+    """Equivalent of BeautifulSoup's get_text(separator, strip=True)"""
+    return separator.join(t for t in (s.strip() for s in TEXT_XPATH(node)) if t)
+
+
+def pick_body(candidates):
+    """Prefer .blog-body, then <article>, then <main> among the BODY_XPATH matches"""
+    for node in candidates:
+        if "blog-body" in node.get("class", "").split():
+            return node
+    for tag in ("article", "main"):
+        for node in candidates:
+            if node.tag == tag:
+                return node
+    return None
+
+
 def fetch_page(url):
     """Fetch and parse a single article page"""
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        html = fetch_html(url)
+        if html is None:
+            return None, None
+        
+        tree = lxml_html.fromstring(html)
         
         # Try to find title
-        title_elem = soup.find("h1")
-        title = title_elem.get_text(strip=True) if title_elem else "Untitled"
+        titles = TITLE_XPATH(tree)
+        title = node_text(titles[0], "") if titles else "Untitled"
         
         # Try to find article body
-        body_elem = soup.select_one(".blog-body") or soup.select_one("article") or soup.find("main")
-        if body_elem:
-            body = body_elem.get_text("\n", strip=True)
+        body_elem = pick_body(BODY_XPATH(tree))
+        if body_elem is not None:
+            body = node_text(body_elem, "\n")
         else:
             # Fallback: get all paragraph text
-            paragraphs = soup.find_all("p")
-            body = "\n".join([p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)])
+            paragraphs = (node_text(p, "") for p in PARAGRAPH_XPATH(tree))
+            body = "\n".join(p for p in paragraphs if p)
         
         return title, body
         
@@ -159,27 +379,94 @@ def chunk_text(text, max_chars=2000):
     if not text or len(text.strip()) < 100:
         return []
     
-    paragraphs = [p.strip() for p in text.split("\n\n") if len(p.strip()) > 100]
+    # Strip each paragraph once (str.strip runs in C via map) instead of twice per paragraph
+    paragraphs = [p for p in map(str.strip, text.split("\n\n")) if len(p) > 100]
     if not paragraphs:
         # Fallback: split by sentences
-        sentences = [s.strip() for s in text.split(". ") if len(s.strip()) > 50]
+        sentences = [s for s in map(str.strip, text.split(". ")) if len(s) > 50]
         paragraphs = sentences
     
-    current, chunks = [], []
+    current, current_len, chunks = [], 0, []
     for p in paragraphs:
-        if sum(len(x) for x in current) + len(p) > max_chars:
+        # +2 accounts for the "\n\n" separator added when joining
+        if current_len + len(p) + 2 > max_chars:
             if current:
                 chunks.append("\n\n".join(current))
-            current = [p]
+            current, current_len = [p], len(p) + 2
         else:
             current.append(p)
+            current_len += len(p) + 2
     
     if current:
         chunks.append("\n\n".join(current))
     
+    # Fold a short trailing fragment into the previous chunk rather than embedding it alone
+    if len(chunks) > 1 and len(chunks[-1]) < 500:
+        tail = chunks.pop()
+        chunks[-1] += "\n\n" + tail
+    
     return chunks
 
 
+def process_article(url, seen_chunks):
+    """Fetch, chunk and embed one article (runs in a worker thread).
+    
+    Returns None when the page has no usable content, otherwise
+    (title, chunks, new_chunks, vectors) where new_chunks maps digest -> (chunk_index, chunk)
+    for chunks not yet indexed and vectors holds their embeddings in the same order.
+    """
+    title, body = fetch_page(url)
+    if not title or not body:
+        return None
+    
+    # Very short chunks embed poorly and still cost an API call
+    chunks = [c for c in chunk_text(body) if len(c) >= MIN_CHUNK_CHARS]
+    
+    # Skip chunks that are already indexed (boilerplate shared across articles, earlier runs)
+    new_chunks = {}
+    for chunk_idx, chunk in enumerate(chunks, 1):
+        digest = chunk_digest(chunk)
+        if digest not in seen_chunks:
+            new_chunks.setdefault(digest, (chunk_idx, chunk))
+    
+    # Generate all embeddings for the article in a single request
+    vectors = embedding_model.encode([chunk for _, chunk in new_chunks.values()]) if new_chunks else []
+    return title, chunks, new_chunks, vectors
+
+
+def create_collection(dim):
+    """Create the collection with int8 scalar quantization (~4x less vector memory)"""
+    qdrant_client.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config=VectorParams(size=dim, distance="Cosine"),
+        hnsw_config=HnswConfigDiff(m=16, ef_construct=128),
+        quantization_config=ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+        )
+    )
+
+
+def chunk_digest(chunk):
+    """16-byte content hash used to skip duplicate chunks and as the Qdrant point ID"""
+    return hashlib.blake2b(chunk.encode(), digest_size=16).digest()
+
+
+def load_seen_chunks():
+    """Digests of chunks indexed by previous runs"""
+    try:
+        with open(SEEN_CHUNKS_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        return set()
+    return {data[i:i + 16] for i in range(0, len(data) - len(data) % 16, 16)}
+
+
+def save_seen_chunks(seen):
+    os.makedirs(os.path.dirname(SEEN_CHUNKS_PATH), exist_ok=True)
+    with open(SEEN_CHUNKS_PATH, "wb") as f:
+        f.write(b"".join(seen))
+
+
 def main():
     print("=" * 60)
     print("BeFit Qdrant Population Script")
@@ -187,12 +474,10 @@ def main():
     print("=" * 60)
     print()
     
-    # Test OpenRouter connection
-    print("🔍 Testing OpenRouter connection...")
+    # Resolve the embedding dimension (cached per model, otherwise probes OpenRouter)
+    print("🔍 Resolving embedding dimension...")
     try:
-        test_embedding = embedding_model.encode("test connection")
-        embedding_dim = len(test_embedding)
-        print(f"✅ OpenRouter connected successfully!")
+        embedding_dim = embedding_model.get_sentence_embedding_dimension()
         print(f"✅ Embedding dimension: {embedding_dim}")
     except Exception as e:
         print(f"❌ Failed to connect to OpenRouter: {e}")
@@ -209,7 +494,7 @@ def main():
     except Exception as e:
         print(f"❌ Failed to connect to Qdrant: {e}")
         print("Make sure Qdrant is running:")
-        print("  docker run -p 6333:6333 -v $(pwd)/qdrant_storage:/qdrant/storage qdrant/qdrant")
+        print("  docker run -p 6333:6333 -p 6334:6334 -v $(pwd)/qdrant_storage:/qdrant/storage qdrant/qdrant")
         return
     
     # Create or verify collection
@@ -221,23 +506,27 @@ def main():
         
         if COLLECTION_NAME not in collection_names:
             print(f"📦 Creating collection '{COLLECTION_NAME}'...")
-            qdrant_client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(size=embedding_dim, distance="Cosine")
-            )
+            create_collection(embedding_dim)
             print(f"✅ Collection '{COLLECTION_NAME}' created")
+            seen_chunks = set()
         else:
             print(f"✅ Collection '{COLLECTION_NAME}' already exists")
+            points_count = qdrant_client.get_collection(COLLECTION_NAME).points_count
+            # A leftover hash file is stale once the collection has been emptied
+            seen_chunks = load_seen_chunks() if points_count else set()
+            if points_count and not os.path.exists(SEEN_CHUNKS_PATH):
+                # e.g. points indexed with the old integer IDs, which re-indexing would duplicate
+                print(f"  ⚠️  No {SEEN_CHUNKS_PATH} for the existing points; answer 'y' unless you want duplicates")
             # Ask if user wants to clear it
             response = input(f"  Do you want to clear existing data and re-index? (y/N): ").strip().lower()
             if response == 'y':
                 print(f"🗑️  Deleting existing collection...")
                 qdrant_client.delete_collection(COLLECTION_NAME)
-                qdrant_client.create_collection(
-                    collection_name=COLLECTION_NAME,
-                    vectors_config=VectorParams(size=embedding_dim, distance="Cosine")
-                )
+                create_collection(embedding_dim)
                 print(f"✅ Collection recreated")
+                seen_chunks = set()
+            elif seen_chunks:
+                print(f"  ⏭️  Skipping {len(seen_chunks)} chunks indexed by earlier runs")
     except Exception as e:
         print(f"❌ Error with Qdrant collection: {e}")
         return
@@ -255,70 +544,84 @@ def main():
     print()
     
     # Process each article
-    idx = 1
+    pending = []
+    last_batch = []
     total_chunks = 0
     successful_articles = 0
     
-    for i, url in enumerate(links, 1):
-        print(f"[{i}/{len(links)}] Processing: {url}")
+    # Fetch, chunk and embed articles concurrently; upserts stay on the main thread
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = [executor.submit(process_article, url, seen_chunks) for url in links]
+        for i, (url, future) in enumerate(zip(links, futures), 1):
+            print(f"[{i}/{len(links)}] Processing: {url}")
         
-        try:
-            title, body = fetch_page(url)
+            try:
+                result = future.result()
             
-            if not title or not body:
-                print(f"  ⚠️  Skipping (no content found)")
-                continue
+                if result is None:
+                    print(f"  ⚠️  Skipping (no content found)")
+                    continue
+                title, chunks, new_chunks, vectors = result
             
-            # Chunk the content
-            chunks = chunk_text(body)
+                if not chunks:
+                    print(f"  ⚠️  Skipping (no valid chunks)")
+                    continue
             
-            if not chunks:
-                print(f"  ⚠️  Skipping (no valid chunks)")
-                continue
+                print(f"  📝 Title: {title[:60]}...")
+                print(f"  📦 Created {len(chunks)} chunks")
             
-            print(f"  📝 Title: {title[:60]}...")
-            print(f"  📦 Created {len(chunks)} chunks")
+                # Another worker may have embedded the same boilerplate chunk in parallel
+                fresh = [
+                    (digest, chunk_idx, chunk, vector)
+                    for (digest, (chunk_idx, chunk)), vector in zip(new_chunks.items(), vectors)
+                    if digest not in seen_chunks
+                ]
+                if not fresh:
+                    print(f"  ⏭️  Skipping (all chunks already indexed)")
+                    continue
             
-            # Generate embeddings and store in Qdrant
-            for chunk_idx, chunk in enumerate(chunks, 1):
-                try:
-                    # Generate embedding
-                    vector = embedding_model.encode(chunk)
-                    
-                    # Store in Qdrant
-                    qdrant_client.upsert(
-                        collection_name=COLLECTION_NAME,
-                        points=[PointStruct(
-                            id=idx,
-                            vector=vector,
-                            payload={
-                                "title": title,
-                                "url": url,
-                                "content": chunk[:500] + "..." if len(chunk) > 500 else chunk,  # Store preview
-                                "chunk_index": chunk_idx,
-                                "total_chunks": len(chunks)
-                            }
-                        )]
+                # Queue points for Qdrant; upserts are batched across articles
+                pending.extend([
+                    PointStruct(
+                        id=str(uuid.UUID(bytes=digest)),
+                        vector=vector.tolist(),
+                        payload={
+                            "title": title,
+                            "url": url,
+                            "content": chunk[:500] + "..." if len(chunk) > 500 else chunk,  # Store preview
+                            "chunk_index": chunk_idx,
+                            "total_chunks": len(chunks)
+                        }
                     )
-                    
-                    idx += 1
-                    total_chunks += 1
-                    
-                    if chunk_idx % 5 == 0:
-                        print(f"    ✓ Indexed {chunk_idx}/{len(chunks)} chunks...")
-                        
-                except Exception as e:
-                    print(f"    ❌ Error indexing chunk {chunk_idx}: {e}")
-                    continue
+                    for digest, chunk_idx, chunk, vector in fresh
+                ])
+                seen_chunks.update(digest for digest, *_ in fresh)
+                if len(pending) >= UPSERT_BATCH_SIZE:
+                    # Don't block on the server applying the batch while we keep scraping
+                    qdrant_client.upsert(collection_name=COLLECTION_NAME, points=pending, wait=False)
+                    last_batch, pending = pending, []
             
-            print(f"  ✅ Successfully indexed article ({len(chunks)} chunks)")
-            successful_articles += 1
+                total_chunks += len(fresh)
             
-        except Exception as e:
-            print(f"  ❌ Error processing article: {e}")
-            continue
+                print(f"  ✅ Successfully indexed article ({len(fresh)}/{len(chunks)} new chunks)")
+                successful_articles += 1
+            
+            except Exception as e:
+                print(f"  ❌ Error processing article: {e}")
+                continue
         
-        print()
+            print()
+    
+    # Final upsert waits so every earlier batch is applied before reporting. If the last
+    # flush emptied the queue, resend that batch instead (same IDs, so it's idempotent)
+    final_batch = pending or last_batch
+    if final_batch:
+        try:
+            qdrant_client.upsert(collection_name=COLLECTION_NAME, points=final_batch, wait=True)
+        except Exception as e:
+            print(f"❌ Error upserting final batch: {e}")
+            return
+    save_seen_chunks(seen_chunks)
     
     # Summary
     print("=" * 60)
@@ -5,21 +5,72 @@ Run this first to diagnose connection issues.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import json
 import os
+import re
+import time
+try:
+    import orjson  # optional: much faster parsing of embedding payloads
+except ImportError:
+    orjson = None
 
 LM_STUDIO_BASE_URL = os.getenv("LM_STUDIO_URL", "http://172.21.96.1:1234")
 
+# Shared session so parallel model probes reuse pooled connections
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_maxsize=8))
+PROBE_WORKERS = 8
+
+# Model ids that look like embedding models; these are probed before anything else
+EMBED_RX = re.compile(r"(embed|bge-|minilm|e5-|gte-|nomic)", re.I)
+
+# Embedding models found by earlier runs, keyed by server URL
+MODELS_CACHE_PATH = os.path.expanduser("~/.cache/befit/lm_models.json")
+MODELS_CACHE_TTL = 600  # seconds
+
+def json_loads(data):
+    """Parse a response body, via orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def load_cached_models(url=LM_STUDIO_BASE_URL):
+    """Return the embedding models recently discovered on url, if still fresh"""
+    try:
+        with open(MODELS_CACHE_PATH) as f:
+            entry = json.load(f).get(url)
+    except (OSError, ValueError):
+        return None
+    if entry and time.time() - entry["ts"] < MODELS_CACHE_TTL:
+        return entry["models"]
+    return None
+
+def save_cached_models(models, url=LM_STUDIO_BASE_URL):
+    """Record the embedding models discovered on url so the next run can skip probing"""
+    try:
+        with open(MODELS_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[url] = {"ts": time.time(), "models": models}
+    try:
+        os.makedirs(os.path.dirname(MODELS_CACHE_PATH), exist_ok=True)
+        with open(MODELS_CACHE_PATH, "w") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"⚠️  Could not write model discovery cache: {e}")
+
 def test_connection():
     print(f"Testing connection to LM Studio at: {LM_STUDIO_BASE_URL}")
     
     # Test basic connection
     try:
-        response = requests.get(f"{LM_STUDIO_BASE_URL}/v1/models", timeout=5)
+        response = SESSION.get(f"{LM_STUDIO_BASE_URL}/v1/models", timeout=5)
         print(f"✅ Server responded with status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             print(f"Response: {json.dumps(data, indent=2)}")
             
             if 'data' in data and data['data']:
@@ -40,8 +91,8 @@ def test_connection():
     except Exception as e:
         print(f"❌ Error: {e}")
 
-def test_embedding(model_name):
-    print(f"\n🧪 Testing embedding generation with model: {model_name}")
+def test_embedding(model_name, log=print):
+    log(f"\n🧪 Testing embedding generation with model: {model_name}")
     
     url = f"{LM_STUDIO_BASE_URL}/v1/embeddings"
     payload = {
@@ -51,36 +102,36 @@ def test_embedding(model_name):
     }
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        print(f"Embedding endpoint status: {response.status_code}")
+        response = SESSION.post(url, json=payload, timeout=10)
+        log(f"Embedding endpoint status: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             if 'data' in data and data['data']:
                 embedding = data['data'][0]['embedding']
-                print(f"✅ Embedding generated successfully!")
-                print(f"   Dimension: {len(embedding)}")
-                print(f"   First 5 values: {embedding[:5]}")
+                log(f"✅ Embedding generated successfully!")
+                log(f"   Dimension: {len(embedding)}")
+                log(f"   First 5 values: {embedding[:5]}")
                 return True
             else:
-                print(f"❌ Unexpected embedding response: {data}")
+                log(f"❌ Unexpected embedding response: {data}")
                 return False
         else:
-            error_data = response.json() if response.content else {}
+            error_data = json_loads(response.content) if response.content else {}
             if "Model is not embedding" in str(error_data):
-                print(f"❌ '{model_name}' is a text generation model, not an embedding model")
-                print("   You need to load an actual embedding model in LM Studio")
-                print("   Recommended embedding models:")
-                print("   - sentence-transformers/all-MiniLM-L6-v2")
-                print("   - nomic-ai/nomic-embed-text-v1.5") 
-                print("   - BAAI/bge-small-en-v1.5")
-                print("   - text-embedding-3-small")
+                log(f"❌ '{model_name}' is a text generation model, not an embedding model")
+                log("   You need to load an actual embedding model in LM Studio")
+                log("   Recommended embedding models:")
+                log("   - sentence-transformers/all-MiniLM-L6-v2")
+                log("   - nomic-ai/nomic-embed-text-v1.5") 
+                log("   - BAAI/bge-small-en-v1.5")
+                log("   - text-embedding-3-small")
             else:
-                print(f"❌ Embedding failed: {response.text}")
+                log(f"❌ Embedding failed: {response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Embedding test failed: {e}")
+        log(f"❌ Embedding test failed: {e}")
         return False
 
 def test_all_models_for_embeddings():
@@ -88,15 +139,27 @@ def test_all_models_for_embeddings():
     print(f"\n🔍 Testing all models for embedding support...")
     
     try:
-        response = requests.get(f"{LM_STUDIO_BASE_URL}/v1/models", timeout=5)
+        response = SESSION.get(f"{LM_STUDIO_BASE_URL}/v1/models", timeout=5)
         if response.status_code == 200:
-            data = response.json()
+            data = json_loads(response.content)
             if 'data' in data and data['data']:
+                def probe(model_name):
+                    # Buffer each probe's output so parallel runs don't interleave
+                    lines = [f"\nTesting {model_name}..."]
+                    return test_embedding(model_name, log=lines.append), lines
+                
+                # Probing a text generation model costs a slow error response, so only
+                # fall back to the other models when no id looks like an embedding model
+                model_names = [model['id'] for model in data['data'] if EMBED_RX.search(model['id'])]
+                if not model_names:
+                    model_names = [model['id'] for model in data['data']]
+                with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as executor:
+                    results = list(executor.map(probe, model_names))
+                
                 embedding_models = []
-                for model in data['data']:
-                    model_name = model['id']
-                    print(f"\nTesting {model_name}...")
-                    if test_embedding(model_name):
+                for model_name, (supports_embeddings, lines) in zip(model_names, results):
+                    print("\n".join(lines))
+                    if supports_embeddings:
                         embedding_models.append(model_name)
                 
                 if embedding_models:
@@ -120,8 +183,21 @@ def test_all_models_for_embeddings():
         return []
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true", help="re-probe every model even if a recent result is cached")
+    args = parser.parse_args()
+    
     test_connection()
-    embedding_models = test_all_models_for_embeddings()
+    embedding_models = None if args.force else load_cached_models()
+    if embedding_models:
+        print(f"\n✅ Using {len(embedding_models)} embedding model(s) found in the last {MODELS_CACHE_TTL // 60} minutes (--force to re-probe):")
+        for model in embedding_models:
+            print(f"   - {model}")
+    else:
+        embedding_models = test_all_models_for_embeddings()
+        # Only successful discoveries are cached, so a newly loaded model is picked up on the next run
+        if embedding_models:
+            save_cached_models(embedding_models)
     
     if not embedding_models:
         print("\n📥 To fix this issue:")
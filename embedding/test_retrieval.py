@@ -1,63 +1,209 @@
 #!/usr/bin/env python3
 # Test script to verify that the embedding and retrieval system is working
 
-import requests
-from qdrant_client import QdrantClient
+import grpc
+import httpx
+from qdrant_client import QdrantClient, models
+from qdrant_client.http.exceptions import UnexpectedResponse
+from collections import OrderedDict
+import numpy as np
+import atexit
+import base64
+import hashlib
+import json
 import os
+import sys
+import time
+try:
+    import orjson  # optional: much faster parsing of embedding payloads
+except ImportError:
+    orjson = None
 
 # Configuration (same as main.py)
 LM_STUDIO_BASE_URL = os.getenv("LM_STUDIO_URL", "http://172.21.96.1:1234")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-nomic-embed-text-v1.5")
+QDRANT_URL = "http://localhost:6333"
 COLL = "rp_exercises"
 
+# Collection metadata is cached briefly so back-to-back runs skip the Qdrant round-trip
+META_CACHE_PATH = os.path.expanduser("~/.cache/befit/qdrant_meta.json")
+META_CACHE_TTL = 60  # seconds
+
+# Query embeddings persisted across runs, one .npy file per text under a per-model directory
+EMBED_CACHE_DIR = os.path.expanduser("~/.cache/befit/emb")
+
+def json_loads(data):
+    """Parse a response body, via orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def decode_embedding(embedding):
+    """Decode a base64-packed float32 embedding, accepting plain float lists from servers that ignore encoding_format"""
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
+
 class LMStudioEmbedding:
-    def __init__(self, base_url=LM_STUDIO_BASE_URL, model=EMBEDDING_MODEL):
+    def __init__(self, base_url=LM_STUDIO_BASE_URL, model=EMBEDDING_MODEL, cache_size=1024):
         self.base_url = base_url
         self.model = model
+        # Request parts that never change between calls are built once
+        self._url = "/v1/embeddings"  # relative to the client's base_url
+        self._payload_base = {
+            "model": model,
+            # Packed float32 bytes are ~4x smaller than a JSON float array and skip per-element parsing
+            "encoding_format": "base64"
+        }
+        # LRU of (model, text) -> embedding so repeated strings skip the round-trip
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        # Keep one pooled connection to LM Studio instead of reconnecting per query
+        self._client = httpx.Client(
+            base_url=base_url,
+            timeout=httpx.Timeout(30.0, connect=3.0),
+            # Pool limits live on the transport once a custom one is supplied
+            transport=httpx.HTTPTransport(
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+                retries=3
+            )
+        )
+        atexit.register(self.close)
+    
+    def close(self):
+        """Release pooled connections"""
+        self._client.close()
         
     def encode(self, text):
-        """Generate embeddings using LM Studio's API"""
-        url = f"{self.base_url}/v1/embeddings"
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "model": self.model,
-            "input": text if isinstance(text, list) else [text],
-            "encoding_format": "float"
-        }
+        """Generate embeddings, only calling LM Studio for texts not in the LRU cache"""
+        texts = text if isinstance(text, list) else [text]
+        
+        found = {}
+        missing = []
+        for t in dict.fromkeys(texts):
+            key = (self.model, t)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[t] = self._cache[key]
+            else:
+                missing.append(t)
+        if missing:
+            for t, embedding in zip(missing, self._request_embeddings(missing)):
+                self._cache[(self.model, t)] = embedding
+                found[t] = embedding
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        
+        embeddings = [found[t] for t in texts]
+        # One contiguous float32 array (a row per input) rather than a list of vectors
+        return embeddings[0] if isinstance(text, str) else np.stack(embeddings)
+    
+    def _request_embeddings(self, texts):
+        """Call LM Studio's embeddings API for a list of texts"""
+        payload = {**self._payload_base, "input": texts}
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._client.post(self._url, json=payload)
             response.raise_for_status()
-            data = response.json()
-            embeddings = [item["embedding"] for item in data["data"]]
-            return embeddings[0] if isinstance(text, str) else embeddings
+            data = json_loads(response.content)
+            return [decode_embedding(item["embedding"]) for item in data["data"]]
         except Exception as e:
             print(f"Error generating embedding: {e}")
             raise
 
+class DiskEmbeddingCache:
+    """On-disk cache of embeddings keyed by sha1(text), scoped to one model"""
+    def __init__(self, model, root=EMBED_CACHE_DIR):
+        # Model ids may contain "/", keep each model to a single directory
+        self.dir = os.path.join(root, model.replace("/", "_"))
+    
+    def _path(self, text):
+        return os.path.join(self.dir, hashlib.sha1(text.encode()).hexdigest() + ".npy")
+    
+    def get(self, text):
+        try:
+            return np.load(self._path(text))
+        except (OSError, ValueError):
+            return None
+    
+    def put(self, text, vec):
+        path = self._path(text)
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            # Write then rename so an interrupted run never leaves a truncated file behind
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.asarray(vec, dtype=np.float32))
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"⚠️  Could not write embedding cache: {e}")
+
+def cached_encode(model, texts, cache):
+    """Encode texts, only calling the model for those not already in the disk cache"""
+    vectors = [cache.get(text) for text in texts]
+    missing = [text for text, vec in zip(texts, vectors) if vec is None]
+    if missing:
+        fresh = dict(zip(missing, model.encode(missing)))
+        for text, vec in fresh.items():
+            cache.put(text, vec)
+        vectors = [fresh[text] if vec is None else vec for text, vec in zip(texts, vectors)]
+    return np.stack(vectors)
+
+def _get_collection_meta(qdr, name, url=QDRANT_URL):
+    """Return the collection's points count and vector size, or None if it doesn't exist"""
+    key = f"{url}/{name}"
+    try:
+        with open(META_CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    meta = cache.get(key)
+    if meta and time.time() - meta["ts"] < META_CACHE_TTL:
+        return meta
+    
+    # A single get_collection call answers both "does it exist?" and "what does it hold?"
+    try:
+        collection_info = qdr.get_collection(name)
+    except UnexpectedResponse as e:
+        if e.status_code == 404:
+            return None
+        raise
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return None
+        raise
+    meta = {
+        "points_count": collection_info.points_count,
+        "vector_size": collection_info.config.params.vectors.size,
+        "ts": time.time()
+    }
+    cache[key] = meta
+    try:
+        os.makedirs(os.path.dirname(META_CACHE_PATH), exist_ok=True)
+        with open(META_CACHE_PATH, "w") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"⚠️  Could not write collection metadata cache: {e}")
+    return meta
+
 def test_retrieval():
     """Test the retrieval system with various queries"""
     
     # Initialize clients
     model = LMStudioEmbedding()
-    qdr = QdrantClient(url="http://localhost:6333")
+    embedding_cache = DiskEmbeddingCache(model.model)
+    # gRPC skips JSON (de)serialization of the query vectors and results
+    qdr = QdrantClient(url=QDRANT_URL, prefer_grpc=True)
     
     # Check if collection exists
     try:
-        collections = qdr.get_collections().collections
-        collection_names = [col.name for col in collections]
+        collection_meta = _get_collection_meta(qdr, COLL)
         
-        if COLL not in collection_names:
+        if collection_meta is None:
             print(f"❌ Collection '{COLL}' not found!")
-            print(f"Available collections: {collection_names}")
             return
         else:
             print(f"✅ Collection '{COLL}' found")
             
-        # Get collection info
-        collection_info = qdr.get_collection(COLL)
-        print(f"Collection points count: {collection_info.points_count}")
-        print(f"Collection vector size: {collection_info.config.params.vectors.size}")
+        print(f"Collection points count: {collection_meta['points_count']}")
+        print(f"Collection vector size: {collection_meta['vector_size']}")
         print()
         
     except Exception as e:
@@ -73,87 +219,84 @@ def test_retrieval():
         "training frequency for muscle growth",
         "rep ranges for hypertrophy"
     ]
-    
-    print("Testing retrieval with various queries:")
-    print("=" * 50)
-    
-    for query in test_queries:
-        try:
-            print(f"\n🔍 Query: '{query}'")
-            
-            # Generate embedding for the query
-            query_vector = model.encode(query)
-            
-            # Search in Qdrant using the newer query_points method
-            search_response = qdr.query_points(
-                collection_name=COLL,
-                query=query_vector,
-                limit=3,  # Get top 3 results
-                with_payload=True
-            )
-            
-            search_results = search_response.points
-            
-            if search_results:
-                print(f"Found {len(search_results)} results:")
-                for i, result in enumerate(search_results, 1):
-                    score = result.score
-                    title = result.payload.get('title', 'No title')
-                    url = result.payload.get('url', 'No URL')
-                    
-                    print(f"  {i}. Score: {score:.3f}")
-                    print(f"     Title: {title}")
-                    print(f"     URL: {url}")
-                    print()
-            else:
-                print("  No results found")
-                
-        except Exception as e:
-            print(f"  ❌ Error processing query '{query}': {e}")
-            continue
-    
-    # Test with a specific detailed query
-    print("\n" + "=" * 50)
-    print("Testing detailed query:")
     detailed_query = "What is the optimal training volume for muscle hypertrophy? How many sets should I do per week?"
     
+    # Embed all test queries plus the detailed query in a single request (queries seen on earlier runs come from disk)
     try:
-        print(f"🔍 Detailed Query: '{detailed_query}'")
-        query_vector = model.encode(detailed_query)
-        
-        search_response = qdr.query_points(
+        *query_vectors, detailed_vector = cached_encode(model, test_queries + [detailed_query], embedding_cache)
+    except Exception as e:
+        print(f"❌ Error generating query embeddings: {e}")
+        return
+    
+    # Run every search in a single Qdrant request: top 3 per test query, top 5 for the detailed query
+    search_requests = [
+        models.QueryRequest(query=query_vector.tolist(), limit=3, with_payload=True)
+        for query_vector in query_vectors
+    ]
+    search_requests.append(models.QueryRequest(query=detailed_vector.tolist(), limit=5, with_payload=True))
+    try:
+        *query_responses, detailed_response = qdr.query_batch_points(
             collection_name=COLL,
-            query=query_vector,
-            limit=5,
-            with_payload=True
+            requests=search_requests
         )
+    except Exception as e:
+        print(f"❌ Error searching Qdrant: {e}")
+        return
+    
+    # Collect the report and write it in one go rather than one print call per line
+    lines = []
+    lines.append("Testing retrieval with various queries:")
+    lines.append("=" * 50)
+    
+    for query, search_response in zip(test_queries, query_responses):
+        lines.append(f"\n🔍 Query: '{query}'")
         
         search_results = search_response.points
         
         if search_results:
-            print(f"\nFound {len(search_results)} results:")
+            lines.append(f"Found {len(search_results)} results:")
             for i, result in enumerate(search_results, 1):
                 score = result.score
                 title = result.payload.get('title', 'No title')
                 url = result.payload.get('url', 'No URL')
                 
-                print(f"\n{i}. Score: {score:.3f}")
-                print(f"   Title: {title}")
-                print(f"   URL: {url}")
-                
-                # If it's the top result, show that it's highly relevant
-                if i == 1:
-                    if score > 0.7:
-                        print("   ✅ Highly relevant result!")
-                    elif score > 0.5:
-                        print("   ✓ Good relevance")
-                    else:
-                        print("   ⚠️ Lower relevance - may need more data")
+                lines.append(f"  {i}. Score: {score:.3f}")
+                lines.append(f"     Title: {title}")
+                lines.append(f"     URL: {url}")
+                lines.append("")
         else:
-            print("No results found for detailed query")
+            lines.append("  No results found")
+    
+    # Test with a specific detailed query
+    lines.append("\n" + "=" * 50)
+    lines.append("Testing detailed query:")
+    lines.append(f"🔍 Detailed Query: '{detailed_query}'")
+    
+    search_results = detailed_response.points
+    
+    if search_results:
+        lines.append(f"\nFound {len(search_results)} results:")
+        for i, result in enumerate(search_results, 1):
+            score = result.score
+            title = result.payload.get('title', 'No title')
+            url = result.payload.get('url', 'No URL')
             
-    except Exception as e:
-        print(f"❌ Error with detailed query: {e}")
+            lines.append(f"\n{i}. Score: {score:.3f}")
+            lines.append(f"   Title: {title}")
+            lines.append(f"   URL: {url}")
+            
+            # If it's the top result, show that it's highly relevant
+            if i == 1:
+                if score > 0.7:
+                    lines.append("   ✅ Highly relevant result!")
+                elif score > 0.5:
+                    lines.append("   ✓ Good relevance")
+                else:
+                    lines.append("   ⚠️ Lower relevance - may need more data")
+    else:
+        lines.append("No results found for detailed query")
+    
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     print("🧪 Testing Retrieval System")